@@ -15,12 +15,40 @@ Author: Generated from Cheek et al. (2021-2022) formalism
 Date: 2026-01-03
 """
 
+import math
+
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.integrate import solve_ivp
+from scipy.optimize import OptimizeResult
 from scipy.interpolate import interp1d
 import json
 
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # Numba is optional: fall back to the plain-Python kernel
+    HAVE_NUMBA = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    # Optional Cython RHS, built with: cythonize -i rhs_kernel.pyx
+    from rhs_kernel import rhs as _rhs_cython
+    HAVE_CYTHON_RHS = True
+except ImportError:
+    HAVE_CYTHON_RHS = False
+
+try:
+    from numba import cuda, float64
+    HAVE_CUDA = cuda.is_available()
+except ImportError:  # CUDA scans additionally need numba.cuda and a GPU
+    HAVE_CUDA = False
+
 # ============================================================================
 # CONSTANTS AND PHYSICAL PARAMETERS
 # ============================================================================
@@ -33,6 +61,37 @@ G_natural = 1.0 / (M_pl**2)  # Gravitational constant in natural units
 # PBH evaporation constant
 Gamma_0_grams3_per_sec = 5.3e-27  # Hawking evaporation coefficient
 
+# Friedmann prefactor: H² = (8π/3) ρ
+EIGHT_PI_OVER_3 = 8.0 * math.pi / 3.0
+
+# Range of exp arguments with a finite, nonzero result. Past the top
+# math.exp raises instead of returning inf; past the bottom it returns
+# 0.0, and a and ρ_rad a⁴ are divided by. Trial steps of the implicit
+# solver can hit either side.
+LOG_FLOAT_MAX = math.log(np.finfo(float).max)
+LOG_FLOAT_MIN = math.log(np.finfo(float).tiny)
+
+# exp(-x) is exactly 0.0 in double precision for x beyond this
+EXP_UNDERFLOW = 746.0
+
+# Adaptive steppers give up once h drops below this many units of |t|
+# (ten machine epsilons: t + h would no longer differ from t reliably)
+STEP_MIN_REL = 10.0 * np.finfo(float).eps
+
+# fastmath for the compiled kernels, minus 'nnan' and 'ninf': with the
+# numpy error model inf/NaN states are expected inputs, and the step
+# control has to see a NaN error norm to reject the step
+FASTMATH_FLAGS = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Integration setup shared by solve() and the scans: initial comoving
+# densities n a³, and the tolerances. M and the densities get an atol of
+# 1e-5 of their initial value; with a shared 1e-10 the 1e-15 densities
+# went unchecked (85% off at M0 = 1 g). Log-quantities get ATOL_LOG.
+N_A3_INITIAL = 1.0e-15
+ATOL_REL_INITIAL = 1.0e-5
+ATOL_LOG = 1.0e-4
+RTOL = 1.0e-6
+
 # ============================================================================
 # CONFIGURATION (From JSON)
 # ============================================================================
@@ -67,9 +126,186 @@ CONFIG = {
         "T_initial_gev": 1.0e9,  # Start from high T
         "T_final_gev": 0.1,  # End at BBN scale
         "n_steps": 1000,
+        "rhs_backend": "auto",  # 'numba', 'cython' or 'auto' (numba, else cython)
+        "method": "RK45",  # solve_ivp method (BDF, Radau, LSODA use the analytic jac),
+                           # or 'dopri5' for the compiled Dormand-Prince driver
+                           # (Numba kernel only; rejects rhs_backend='cython')
     }
 }
 
+# ============================================================================
+# COMPILED RIGHT-HAND SIDE
+# ============================================================================
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _memory_burden_s2(M, M0):
+    """
+    Scalar memory burden suppression S²(M), written as a single select
+    so the compiled kernel has no data-dependent branch at M = M0/2.
+    (M/M0)^(2/3) is taken as cbrt((M/M0)²), cheaper than a generic pow.
+    """
+    ratio = M / M0
+    return 1.0 if M > M0 * 0.5 else np.cbrt(ratio * ratio)
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _greybody_pair(dM_dt, T_hawking, m_wimp, dof_w, eff_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Greybody production rates (WIMP, axion) from one evaporation step.
+    
+    dn_i/dt ∝ |dM_pbh/dt| * σ_i(T_H) / T_H³, Boltzmann-suppressed if m_i > T_H.
+    The species-independent |dM/dt| / T_H³ * β·1e10 prefactor is computed
+    once; beta_coeff is β·1e10, precomputed by the caller.
+    
+    exp(-m/T_H) is only evaluated between the two regimes where it is
+    known: 1 for m <= T_H (the axion, always) and exactly 0.0 once m/T_H
+    is past the exp underflow (a heavy WIMP from a cold, massive PBH).
+    """
+    inv_T = 1.0 / T_hawking
+    prefactor = abs(dM_dt) * (inv_T * inv_T * inv_T) * beta_coeff
+    
+    prod_wimp = prefactor * eff_w * dof_w
+    x_wimp = m_wimp * inv_T
+    if x_wimp > EXP_UNDERFLOW:
+        prod_wimp = 0.0
+    elif x_wimp > 1.0:
+        prod_wimp *= math.exp(-x_wimp)
+    
+    prod_axion = prefactor * eff_ax * dof_ax
+    x_axion = m_ax * inv_T
+    if x_axion > EXP_UNDERFLOW:
+        prod_axion = 0.0
+    elif x_axion > 1.0:
+        prod_axion *= math.exp(-x_axion)
+    
+    return prod_wimp, prod_axion
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _greybody_pair_dM(M_pbh, dM_dt, d_dMdt_dM, T_hawking,
+                      m_wimp, dof_w, eff_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    _greybody_pair plus the M-derivative of each rate, for the Jacobian.
+    
+    P ∝ |dM/dt| / T_H³ * exp(-m/T_H) with T_H = 1.23/M, so
+    d ln P/dM = (d(dM/dt)/dM) / (dM/dt) + 3/M [- m/(T_H M) if m > T_H].
+    Returns (P_wimp, dP_wimp/dM, P_axion, dP_axion/dM).
+    """
+    prod_wimp, prod_axion = _greybody_pair(
+        dM_dt, T_hawking, m_wimp, dof_w, eff_w, m_ax, dof_ax, eff_ax, beta_coeff
+    )
+    log_derivative = d_dMdt_dM / dM_dt + 3.0 / M_pbh
+    inv_TM = 1.0 / (T_hawking * M_pbh)
+    
+    dlog_wimp = log_derivative - m_wimp * inv_TM if m_wimp > T_hawking else log_derivative
+    dlog_axion = log_derivative - m_ax * inv_TM if m_ax > T_hawking else log_derivative
+    
+    return prod_wimp, prod_wimp * dlog_wimp, prod_axion, prod_axion * dlog_axion
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _rhs_tuple(t_param, M_pbh, n_wimp_a3, n_axion_a3, log_rho_rad_a4, log_a,
+               M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Right-hand side of ODE system: dy/dt
+    
+    y = (M_pbh, n_wimp_a3, n_axion_a3, log(rho_rad_a4), log(a))
+    
+    Purely functional kernel over plain scalars: it allocates nothing and
+    returns the five derivatives as a tuple, so the same code compiles
+    for the CPU (numba.njit) and as a device function (numba.cuda). The
+    Hawking temperature, memory burden, evaporation and greybody helpers
+    of PBHUnifiedDMSolver are inlined here; both species share one
+    _greybody_pair evaluation.
+    """
+    a = math.exp(max(min(log_a, LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+    a3 = a * a * a
+    a4 = a3 * a
+    inv_a3 = 1.0 / a3
+    rho_rad_a4 = math.exp(max(min(log_rho_rad_a4, LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+    
+    # Derived quantities
+    T_hawking = 1.23 / M_pbh
+    n_wimp = n_wimp_a3 * inv_a3
+    n_axion = n_axion_a3 * inv_a3
+    rho_rad = rho_rad_a4 / a4
+    rho_wimp = n_wimp * m_wimp
+    rho_axion = n_axion * m_ax
+    
+    # Hubble parameter (simplified Friedmann)
+    H = math.sqrt(EIGHT_PI_OVER_3 * (rho_rad + rho_wimp + rho_axion + M_pbh))
+    
+    # ────────────────────────────────────────────────────────────
+    # EQUATION 1: PBH mass evolution (memory burden S²)
+    # ────────────────────────────────────────────────────────────
+    S2 = _memory_burden_s2(M_pbh, M0)
+    inv_M2 = 1.0 / (M_pbh * M_pbh)
+    dM_dt = -Gamma_0_grams3_per_sec * inv_M2 * S2
+    
+    dn_wimp_prod, dn_axion_prod = _greybody_pair(
+        dM_dt, T_hawking, m_wimp, dof_w, eff_w, m_ax, dof_ax, eff_ax, beta_coeff
+    )
+    
+    # ────────────────────────────────────────────────────────────
+    # EQUATION 2: WIMP production and annihilation
+    # ────────────────────────────────────────────────────────────
+    dn_wimp_ann = xsec_w * n_wimp ** 2
+    
+    d_nwimp_a3_dt = (dn_wimp_prod - dn_wimp_ann * inv_a3) * a3 + n_wimp_a3 * (H * a)
+    
+    # ────────────────────────────────────────────────────────────
+    # EQUATION 3: Axion production
+    # ────────────────────────────────────────────────────────────
+    d_naxion_a3_dt = dn_axion_prod * a3 + n_axion_a3 * (H * a)
+    
+    # ────────────────────────────────────────────────────────────
+    # EQUATION 4: Radiation energy (energy conservation)
+    # ────────────────────────────────────────────────────────────
+    # Energy lost by PBH → radiation
+    dE_rad_dt = -dM_dt  # (in appropriate units)
+    d_log_rho_rad_a4_dt = dE_rad_dt / rho_rad_a4 - 4 * H if rho_rad_a4 > 0 else 0.0
+    
+    # ────────────────────────────────────────────────────────────
+    # EQUATION 5: Scale factor
+    # ────────────────────────────────────────────────────────────
+    d_log_a_dt = H if a > 0 else 0.0
+    
+    return dM_dt, d_nwimp_a3_dt, d_naxion_a3_dt, d_log_rho_rad_a4_dt, d_log_a_dt
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _rhs(t_param, y, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    solve_ivp adapter around _rhs_tuple: unpack y, pack dy/dt into an ndarray.
+    """
+    dy = _rhs_tuple(t_param, y[0], y[1], y[2], y[3], y[4],
+                    M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    out = np.empty(5)
+    for i in range(5):
+        out[i] = dy[i]
+    return out
+
+
+@njit(cache=True, error_model='numpy')
+def _initial_state(M0, y, atol):
+    """
+    Fill the caller-owned y (initial conditions) and atol (per-component
+    absolute tolerances) for a PBH of initial mass M0.
+    
+    y = [M_pbh, n_wimp_a3, n_axion_a3, log(rho_rad_a4), log(a)]
+    """
+    y[0] = M0
+    y[1] = N_A3_INITIAL
+    y[2] = N_A3_INITIAL
+    y[3] = 0.0  # log(ρ_rad a⁴) with ρ_rad a⁴ = 1
+    y[4] = 0.0  # log(a) with a = 1
+    atol[0] = ATOL_REL_INITIAL * M0
+    atol[1] = ATOL_REL_INITIAL * N_A3_INITIAL
+    atol[2] = ATOL_REL_INITIAL * N_A3_INITIAL
+    atol[3] = ATOL_LOG
+    atol[4] = ATOL_LOG
+
+
 # ============================================================================
 # CLASS: PBHUnifiedDMSolver
 # ============================================================================
@@ -87,12 +323,37 @@ class PBHUnifiedDMSolver:
     
     def __init__(self, config):
         self.config = config
+        self._cache_params()
         self.results = {
-            'a': [], 't': [], 'T': [], 'M_pbh': [], 'T_hawking': [],
-            'n_wimp_a3': [], 'n_axion_a3': [], 'rho_rad': [],
-            'f_wimp': [], 'f_axion': [], 'f_pbh_rem': []
+            key: np.empty(0) for key in (
+                'a', 't', 'T', 'M_pbh', 'T_hawking',
+                'n_wimp_a3', 'n_axion_a3', 'rho_rad',
+                'f_wimp', 'f_axion', 'f_pbh_rem'
+            )
         }
     
+    def _cache_params(self):
+        """
+        Bind the configuration scalars used on the hot path to float
+        attributes, so the RHS never walks the nested config dict.
+        """
+        wimp = self.config['dm']['wimp']
+        axion = self.config['dm']['axion']
+        self._M0 = float(self.config['pbh']['M_initial_grams'])
+        self._beta = float(self.config['pbh']['beta'])
+        self._m_wimp = float(wimp['mass_gev'])
+        self._dof_w = float(wimp['dof'])
+        self._eff_w = float(wimp['relative_greybody_efficiency'])
+        self._xsec_w = float(wimp['annihilation_xsec_cm3_s'])
+        self._m_ax = float(axion['mass_gev'])
+        self._dof_ax = float(axion['dof'])
+        self._eff_ax = float(axion['relative_greybody_efficiency'])
+        
+        # Constant subexpressions of the RHS and post-processing
+        self._beta_coeff = self._beta * 1e10  # Numerical coefficient of production
+        self._M_thresh = 0.5 * self._M0  # Memory burden onset
+        self._T0 = float(self.config['solver']['T_initial_gev'])
+    
     def hawking_temperature_gev(self, M_grams):
         """
         Hawking temperature in GeV.
@@ -107,43 +368,48 @@ class PBHUnifiedDMSolver:
         S²(M) = 1.0 if M > M0/2
         S²(M) = (M/M0)^(2/3) if M ≤ M0/2
         
-        This suppresses Hawking evaporation at low masses.
+        This suppresses Hawking evaporation at low masses. Plain Python on
+        purpose: a Numba dispatch costs more than this scalar select
+        (the compiled kernels use _memory_burden_s2).
         """
-        M_thresh = M0 * 0.5
-        if M > M_thresh:
+        if M > M0 * 0.5:
             return 1.0
-        else:
-            ratio = M / M0
-            return ratio ** (2.0 / 3.0)  # Exponent 2/3 from entropy
+        ratio = M / M0
+        return ratio ** (2.0 / 3.0)  # Exponent 2/3 from entropy
     
     def evaporation_rate(self, M_pbh, M0):
         """
         dM_pbh/dt = -Γ₀/M_pbh² * S²(M)
         """
         S2 = self.memory_burden_suppression(M_pbh, M0)
-        return -Gamma_0_grams3_per_sec / (M_pbh ** 2) * S2
+        inv_M2 = 1.0 / (M_pbh * M_pbh)
+        return -Gamma_0_grams3_per_sec * inv_M2 * S2
     
-    def greybody_production_rate(self, M_pbh, T_hawking, particle_config, dm_total_energy):
+    def greybody_production_rate(self, M_pbh, T_hawking, particle_config,
+                                 dm_total_energy=None, *, dM_dt=None):
         """
         Production rate of DM particle from Hawking radiation.
         
         dn_i/dt ∝ |dM_pbh/dt| * σ_i(T_H) / T_H³
         
-        where σ_i is the greybody factor (spin-dependent).
+        where σ_i is the greybody factor (spin-dependent). A caller that
+        already has evaporation_rate(M_pbh, M0) can pass it as dM_dt so it
+        is not recomputed per species.
         """
-        dM_dt = self.evaporation_rate(M_pbh, self.config['pbh']['M_initial_grams'])
+        if dM_dt is None:
+            dM_dt = self.evaporation_rate(M_pbh, self._M0)
         
         # Energy flux divided by T³ gives particle flux
         production_rate = (
-            np.abs(dM_dt) / (T_hawking ** 3) *
+            abs(dM_dt) / (T_hawking ** 3) *
             particle_config['relative_greybody_efficiency'] *
             particle_config['dof'] *
-            self.config['pbh']['beta'] * 1e10  # Numerical coefficient
+            self._beta_coeff  # β * numerical coefficient
         )
         
         # Boltzmann suppression if m_i > T_H
         if particle_config['mass_gev'] > T_hawking:
-            suppression = np.exp(-particle_config['mass_gev'] / T_hawking)
+            suppression = math.exp(-particle_config['mass_gev'] / T_hawking)
             production_rate *= suppression
         
         return production_rate
@@ -157,106 +423,218 @@ class PBHUnifiedDMSolver:
         xsec = particle_config['annihilation_xsec_cm3_s']
         return xsec * n_particle ** 2
     
+    def _kernel_params(self):
+        """
+        Unpack the configuration into the scalar arguments of _rhs.
+        """
+        return (
+            self._M0,
+            self._m_wimp, self._dof_w, self._eff_w, self._xsec_w,
+            self._m_ax, self._dof_ax, self._eff_ax,
+            self._beta_coeff,
+        )
+    
+    def _select_rhs(self):
+        """
+        Pick the compiled right-hand side named by config['solver']['rhs_backend'].
+        
+        'auto' prefers the Numba kernel and falls back to the Cython build
+        (or to the plain-Python kernel when neither is available).
+        """
+        backend = self.config['solver'].get('rhs_backend', 'auto')
+        if backend == 'cython' or (backend == 'auto' and not HAVE_NUMBA and HAVE_CYTHON_RHS):
+            if not HAVE_CYTHON_RHS:
+                raise ImportError("rhs_backend='cython' needs rhs_kernel built with cythonize")
+            return _rhs_cython
+        if backend not in ('auto', 'numba'):
+            raise ValueError(f"Unknown rhs_backend: {backend!r}")
+        return _rhs
+    
     def boltzmann_rhs(self, t_param, y):
         """
         Right-hand side of ODE system: dy/dt
         
         y = [M_pbh, n_wimp_a3, n_axion_a3, log(rho_rad_a4), log(a)]
         """
+        return _rhs(t_param, y, *self._kernel_params())
+    
+    def jac(self, t_param, y):
+        """
+        Analytic Jacobian of boltzmann_rhs: J[i, j] = ∂(dy_i/dt)/∂y_j
+        
+        y = [M_pbh, n_wimp_a3, n_axion_a3, log(rho_rad_a4), log(a)]
+        
+        Used when method is BDF, Radau or LSODA; supplying J spares those
+        solvers a finite-difference Jacobian.
+        """
         M_pbh = y[0]
         n_wimp_a3 = y[1]
         n_axion_a3 = y[2]
         log_rho_rad_a4 = y[3]
         log_a = y[4]
         
-        a = np.exp(log_a)
-        rho_rad_a4 = np.exp(log_rho_rad_a4)
+        m_wimp = self._m_wimp
+        m_axion = self._m_ax
+        xsec = self._xsec_w
+        M0 = self._M0
+        
+        a = math.exp(max(min(log_a, LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+        a3 = a * a * a
+        inv_a3 = 1.0 / a3
+        inv_a6 = inv_a3 * inv_a3
+        rho_rad_a4 = math.exp(max(min(log_rho_rad_a4, LOG_FLOAT_MAX), LOG_FLOAT_MIN))
         
-        # Derived quantities
         T_hawking = self.hawking_temperature_gev(M_pbh)
-        T_radiation = 1.0e9 / a  # T ∝ 1/a (radiation era)
-        n_wimp = n_wimp_a3 / (a ** 3)
-        n_axion = n_axion_a3 / (a ** 3)
-        rho_rad = rho_rad_a4 / (a ** 4)
-        rho_wimp = n_wimp * self.config['dm']['wimp']['mass_gev']
-        rho_axion = n_axion * self.config['dm']['axion']['mass_gev']
+        rho_rad = rho_rad_a4 / (a3 * a)
+        rho_wimp = n_wimp_a3 * inv_a3 * m_wimp
+        rho_axion = n_axion_a3 * inv_a3 * m_axion
         
-        # Hubble parameter (simplified Friedmann)
-        H = np.sqrt(8 * np.pi / 3 * (rho_rad + rho_wimp + rho_axion + M_pbh))
+        H = math.sqrt(EIGHT_PI_OVER_3 * (rho_rad + rho_wimp + rho_axion + M_pbh))
+        
+        # ∂H/∂y_j = (4π/3) / H * ∂ρ_total/∂y_j
+        dH = 0.5 * EIGHT_PI_OVER_3 / H * np.array([
+            1.0,
+            m_wimp * inv_a3,
+            m_axion * inv_a3,
+            rho_rad,
+            -4 * rho_rad - 3 * rho_wimp - 3 * rho_axion,
+        ])
         
         # ────────────────────────────────────────────────────────────
-        # EQUATION 1: PBH mass evolution
+        # PBH mass: dM/dt = -Γ₀/M² * S²(M)
         # ────────────────────────────────────────────────────────────
-        dM_dt = self.evaporation_rate(M_pbh, self.config['pbh']['M_initial_grams'])
+        S2 = self.memory_burden_suppression(M_pbh, M0)
+        dS2_dM = 0.0 if M_pbh > self._M_thresh else 2.0 / 3.0 * S2 / M_pbh
+        dM_dt = self.evaporation_rate(M_pbh, M0)
+        d_dMdt_dM = (2 * Gamma_0_grams3_per_sec * S2 / M_pbh ** 3
+                     - Gamma_0_grams3_per_sec / M_pbh ** 2 * dS2_dM)
         
         # ────────────────────────────────────────────────────────────
-        # EQUATION 2: WIMP production and annihilation
+        # Greybody production: P ∝ |dM/dt| / T_H³ * exp(-m/T_H)
+        # with dT_H/dM = -T_H/M
         # ────────────────────────────────────────────────────────────
-        dn_wimp_prod = self.greybody_production_rate(
-            M_pbh, T_hawking,
-            self.config['dm']['wimp'],
-            rho_wimp
+        prod_wimp, dprod_wimp_dM, prod_axion, dprod_axion_dM = _greybody_pair_dM(
+            M_pbh, dM_dt, d_dMdt_dM, T_hawking,
+            m_wimp, self._dof_w, self._eff_w, m_axion, self._dof_ax, self._eff_ax,
+            self._beta_coeff
         )
-        dn_wimp_ann = self.annihilation_rate(n_wimp, self.config['dm']['wimp'])
         
-        d_nwimp_a3_dt = (dn_wimp_prod - dn_wimp_ann / (a ** 3)) * (a ** 3) + n_wimp_a3 * (H * a)
+        J = np.zeros((5, 5))
         
-        # ────────────────────────────────────────────────────────────
-        # EQUATION 3: Axion production
-        # ────────────────────────────────────────────────────────────
-        dn_axion_prod = self.greybody_production_rate(
-            M_pbh, T_hawking,
-            self.config['dm']['axion'],
-            rho_axion
-        )
+        J[0, 0] = d_dMdt_dM
         
-        d_naxion_a3_dt = dn_axion_prod * (a ** 3) + n_axion_a3 * (H * a)
+        # d(n_wimp a³)/dt = P_w a³ - <σv> (n_wimp a³)² / a⁶ + n_wimp a³ * H a
+        J[1, :] = n_wimp_a3 * a * dH
+        J[1, 0] += dprod_wimp_dM * a3
+        J[1, 1] += -2 * xsec * n_wimp_a3 * inv_a6 + H * a
+        J[1, 4] += (3 * prod_wimp * a3 + 6 * xsec * n_wimp_a3 ** 2 * inv_a6
+                    + n_wimp_a3 * H * a)
         
-        # ────────────────────────────────────────────────────────────
-        # EQUATION 4: Radiation energy (energy conservation)
-        # ────────────────────────────────────────────────────────────
-        # Energy lost by PBH → radiation
-        dE_rad_dt = -dM_dt  # (in appropriate units)
-        d_log_rho_rad_a4_dt = dE_rad_dt / rho_rad_a4 - 4 * H if rho_rad_a4 > 0 else 0
+        # d(n_axion a³)/dt = P_a a³ + n_axion a³ * H a
+        J[2, :] = n_axion_a3 * a * dH
+        J[2, 0] += dprod_axion_dM * a3
+        J[2, 2] += H * a
+        J[2, 4] += 3 * prod_axion * a3 + n_axion_a3 * H * a
         
-        # ────────────────────────────────────────────────────────────
-        # EQUATION 5: Scale factor
-        # ────────────────────────────────────────────────────────────
-        d_log_a_dt = H if a > 0 else 0
+        # d log(ρ_rad a⁴)/dt = -(dM/dt) / (ρ_rad a⁴) - 4H
+        J[3, :] = -4 * dH
+        J[3, 0] += -d_dMdt_dM / rho_rad_a4
+        J[3, 3] += dM_dt / rho_rad_a4
+        
+        # d log(a)/dt = H
+        J[4, :] = dH
         
-        return [dM_dt, d_nwimp_a3_dt, d_naxion_a3_dt, d_log_rho_rad_a4_dt, d_log_a_dt]
+        return J
+    
+    def check_jacobian(self, y, t_param=0.0, rel_step=1.0e-6):
+        """
+        Compare jac against central finite differences of boltzmann_rhs.
+        
+        Returns the largest entry-wise relative error. Each entry is measured
+        against its own size plus the round-off floor of the difference
+        quotient, so small-but-nonzero entries (e.g. ∂P/∂M) are checked too.
+        """
+        self._cache_params()
+        y = np.asarray(y, dtype=float)
+        J = self.jac(t_param, y)
+        J_fd = np.empty_like(J)
+        noise = np.empty_like(J)
+        for j in range(y.size):
+            h = rel_step * max(abs(y[j]), 1.0e-3)
+            y_hi = y.copy()
+            y_lo = y.copy()
+            y_hi[j] += h
+            y_lo[j] -= h
+            f_hi = self.boltzmann_rhs(t_param, y_hi)
+            f_lo = self.boltzmann_rhs(t_param, y_lo)
+            J_fd[:, j] = (f_hi - f_lo) / (2 * h)
+            noise[:, j] = 1.0e-9 * np.maximum(np.abs(f_hi), np.abs(f_lo)) / h
+        return np.max(np.abs(J - J_fd) / (np.abs(J_fd) + noise + 1.0e-300))
     
     def solve(self):
         """
         Integrate from early to late times.
         """
         
-        # Initial conditions
-        M0 = self.config['pbh']['M_initial_grams']
-        y0 = np.array([
-            M0,  # M_pbh
-            1.0e-15,  # n_wimp * a³
-            1.0e-15,  # n_axion * a³
-            np.log(1.0),  # log(ρ_rad a⁴)
-            np.log(1.0),  # log(a)
-        ])
+        # Re-read the config in case it was edited after construction
+        self._cache_params()
+        
+        # Initial conditions and per-component absolute tolerances
+        y0 = np.empty(5)
+        atol = np.empty(5)
+        _initial_state(self._M0, y0, atol)
         
         # Time parametrization
         t_span = (0, 1)
         t_eval = np.linspace(0, 1, self.config['solver']['n_steps'])
         
-        # Solve ODE
-        sol = solve_ivp(
-            self.boltzmann_rhs,
-            t_span=t_span,
-            y0=y0,
-            t_eval=t_eval,
-            method='RK45',
-            dense_output=True,
-            max_step=0.001,
-            rtol=1.0e-6,
-            atol=1.0e-10
-        )
+        # Unpack the configuration once; the compiled kernel sees only scalars
+        params = self._kernel_params()
+        rhs = self._select_rhs()
+        
+        rtol = RTOL
+        
+        method = self.config['solver'].get('method', 'RK45')
+        if method == 'dopri5':
+            if self.config['solver'].get('rhs_backend', 'auto') == 'cython':
+                raise ValueError("method='dopri5' always runs the Numba kernel; "
+                                 "use a solve_ivp method with rhs_backend='cython'")
+            # Whole integration in compiled code: no Python call per RHS
+            ys, n_done = _dopri5_t_eval(y0, t_eval, atol, rtol, 100000, *params)
+            success = n_done == t_eval.size
+            sol = OptimizeResult(
+                t=t_eval[:n_done], y=ys[:, :n_done], success=success,
+                status=0 if success else -1,
+                message=("The solver successfully reached the end of the integration interval."
+                         if success else "Integration step failed.")
+            )
+        else:
+            # Implicit / stiffness-switching methods take the analytic Jacobian
+            options = {'jac': self.jac} if method in ('BDF', 'Radau', 'LSODA') else {}
+            
+            # Solve ODE
+            sol = solve_ivp(
+                lambda t, y: rhs(t, y, *params),
+                t_span=t_span,
+                y0=y0,
+                t_eval=t_eval,
+                method=method,
+                **options,
+                rtol=rtol,
+                atol=atol
+            )
+            
+            # LSODA never rejects non-finite states and can "succeed" on NaNs:
+            # keep the finite prefix and report the failure
+            finite = np.isfinite(sol.y).all(axis=0)
+            if not finite.all():
+                n_finite = int(np.argmin(finite))
+                sol.message = (f"Integration produced a non-finite state at "
+                               f"t = {sol.t[n_finite]:.6g}.")
+                sol.t = sol.t[:n_finite]
+                sol.y = sol.y[:, :n_finite]
+                sol.success = False
+                sol.status = -1
         
         # Post-process results
         self._post_process(sol)
@@ -271,56 +649,45 @@ class PBHUnifiedDMSolver:
         t_vals = sol.t
         y_vals = sol.y
         
-        for i, t in enumerate(t_vals):
-            M_pbh = y_vals[0, i]
-            n_wimp_a3 = y_vals[1, i]
-            n_axion_a3 = y_vals[2, i]
-            log_rho_rad_a4 = y_vals[3, i]
-            log_a = y_vals[4, i]
-            
-            a = np.exp(log_a)
-            rho_rad_a4 = np.exp(log_rho_rad_a4)
-            
-            n_wimp = n_wimp_a3 / (a ** 3)
-            n_axion = n_axion_a3 / (a ** 3)
-            
-            T_hawking = self.hawking_temperature_gev(M_pbh)
-            T_rad = 1.0e9 / a
-            
-            # Energy densities
-            rho_wimp = n_wimp * self.config['dm']['wimp']['mass_gev']
-            rho_axion = n_axion * self.config['dm']['axion']['mass_gev']
-            rho_rad = rho_rad_a4 / (a ** 4)
-            
-            # PBH remnants (memory burden stabilized)
-            M0 = self.config['pbh']['M_initial_grams']
-            if M_pbh < M0 * 0.5:
-                rho_pbh_rem = M_pbh  # Unevaporated portion
-            else:
-                rho_pbh_rem = 0.0
-            
-            rho_dm_total = rho_wimp + rho_axion + rho_pbh_rem
-            
-            # Fractions
-            if rho_dm_total > 1.0e-30:
-                f_wimp = rho_wimp / rho_dm_total
-                f_axion = rho_axion / rho_dm_total
-                f_pbh_rem = rho_pbh_rem / rho_dm_total
-            else:
-                f_wimp = f_axion = f_pbh_rem = 0.0
-            
-            # Store
-            self.results['a'].append(a)
-            self.results['t'].append(t)
-            self.results['T'].append(T_rad)
-            self.results['M_pbh'].append(M_pbh)
-            self.results['T_hawking'].append(T_hawking)
-            self.results['n_wimp_a3'].append(n_wimp_a3)
-            self.results['n_axion_a3'].append(n_axion_a3)
-            self.results['rho_rad'].append(rho_rad)
-            self.results['f_wimp'].append(f_wimp)
-            self.results['f_axion'].append(f_axion)
-            self.results['f_pbh_rem'].append(f_pbh_rem)
+        # Whole trajectory at once: every field is an array over sol.t
+        M_pbh = y_vals[0]
+        n_wimp_a3 = y_vals[1]
+        n_axion_a3 = y_vals[2]
+        log_rho_rad_a4 = y_vals[3]
+        log_a = y_vals[4]
+        
+        a = np.exp(log_a)
+        inv_a = 1.0 / a
+        inv_a3 = inv_a * inv_a * inv_a
+        rho_rad_a4 = np.exp(log_rho_rad_a4)
+        
+        T_hawking = self.hawking_temperature_gev(M_pbh)
+        T_rad = self._T0 * inv_a
+        
+        # Energy densities
+        rho_wimp = n_wimp_a3 * (inv_a3 * self._m_wimp)
+        rho_axion = n_axion_a3 * (inv_a3 * self._m_ax)
+        rho_rad = rho_rad_a4 * (inv_a3 * inv_a)
+        
+        # PBH remnants (memory burden stabilized): unevaporated portion
+        rho_pbh_rem = np.where(M_pbh < self._M_thresh, M_pbh, 0.0)
+        
+        rho_dm_total = rho_wimp + rho_axion + rho_pbh_rem
+        
+        # Fractions: one masked reciprocal instead of three guarded divisions,
+        # so empty (or 0/0) entries are never evaluated
+        inv_total = np.divide(1.0, rho_dm_total, out=np.zeros_like(rho_dm_total),
+                              where=rho_dm_total > 1.0e-30)
+        f_wimp = rho_wimp * inv_total
+        f_axion = rho_axion * inv_total
+        f_pbh_rem = rho_pbh_rem * inv_total
+        
+        # Store
+        self.results = {
+            'a': a, 't': t_vals, 'T': T_rad, 'M_pbh': M_pbh, 'T_hawking': T_hawking,
+            'n_wimp_a3': n_wimp_a3, 'n_axion_a3': n_axion_a3, 'rho_rad': rho_rad,
+            'f_wimp': f_wimp, 'f_axion': f_axion, 'f_pbh_rem': f_pbh_rem
+        }
     
     def print_summary(self):
         """Print results summary."""
@@ -367,16 +734,19 @@ class PBHUnifiedDMSolver:
     def plot_results(self, filename='pbh_unified_results.pdf'):
         """Generate diagnostic plots."""
         
+        # _post_process stores ndarrays: plot them without copying
+        a = self.results['a']
+        f_wimp = self.results['f_wimp']
+        f_axion = self.results['f_axion']
+        f_pbh_rem = self.results['f_pbh_rem']
+        
         fig, axes = plt.subplots(2, 2, figsize=(14, 10))
         
         # Plot 1: DM Composition Evolution
         ax = axes[0, 0]
-        ax.plot(self.results['a'], np.array(self.results['f_wimp']) * 100, 
-                label='WIMPs', linewidth=2)
-        ax.plot(self.results['a'], np.array(self.results['f_axion']) * 100,
-                label='Axions', linewidth=2)
-        ax.plot(self.results['a'], np.array(self.results['f_pbh_rem']) * 100,
-                label='PBH Remnants', linewidth=2)
+        ax.plot(a, f_wimp * 100, label='WIMPs', linewidth=2)
+        ax.plot(a, f_axion * 100, label='Axions', linewidth=2)
+        ax.plot(a, f_pbh_rem * 100, label='PBH Remnants', linewidth=2)
         ax.axhline(y=62, color='blue', linestyle='--', alpha=0.5, label='Target WIMPs (62%)')
         ax.axhline(y=33, color='orange', linestyle='--', alpha=0.5, label='Target Axions (33%)')
         ax.set_xlabel('Scale factor a')
@@ -388,7 +758,7 @@ class PBHUnifiedDMSolver:
         
         # Plot 2: PBH Mass Evolution
         ax = axes[0, 1]
-        ax.plot(self.results['a'], self.results['M_pbh'], linewidth=2, color='black')
+        ax.plot(a, self.results['M_pbh'], linewidth=2, color='black')
         ax.axhline(y=self.config['pbh']['M_initial_grams'] * 0.5, color='red',
                   linestyle='--', label='Memory burden threshold')
         ax.set_xlabel('Scale factor a')
@@ -401,7 +771,7 @@ class PBHUnifiedDMSolver:
         
         # Plot 3: Hawking Temperature
         ax = axes[1, 0]
-        ax.plot(self.results['a'], self.results['T_hawking'], linewidth=2, color='red')
+        ax.plot(a, self.results['T_hawking'], linewidth=2, color='red')
         ax.axhline(y=self.config['dm']['wimp']['mass_gev'], color='blue',
                   linestyle='--', label='WIMP mass')
         ax.axhline(y=self.config['dm']['axion']['mass_gev'], color='green',
@@ -416,11 +786,7 @@ class PBHUnifiedDMSolver:
         
         # Plot 4: Final Composition (Pie Chart)
         ax = axes[1, 1]
-        final_values = [
-            self.results['f_wimp'][-1] * 100,
-            self.results['f_axion'][-1] * 100,
-            self.results['f_pbh_rem'][-1] * 100
-        ]
+        final_values = np.array([f_wimp[-1], f_axion[-1], f_pbh_rem[-1]]) * 100
         labels = [f"WIMPs\n{final_values[0]:.1f}%",
                  f"Axions\n{final_values[1]:.1f}%",
                  f"PBH rem\n{final_values[2]:.1f}%"]
@@ -435,6 +801,360 @@ class PBHUnifiedDMSolver:
         plt.show()
 
 
+# ============================================================================
+# PARAMETER SCANS
+# ============================================================================
+
+# Dormand-Prince 5(4) tableau (the pair behind scipy's RK45)
+_DP_C = (0.0, 1.0 / 5.0, 3.0 / 10.0, 4.0 / 5.0, 8.0 / 9.0, 1.0)
+_DP_A = (
+    (0.0, 0.0, 0.0, 0.0, 0.0),
+    (1.0 / 5.0, 0.0, 0.0, 0.0, 0.0),
+    (3.0 / 40.0, 9.0 / 40.0, 0.0, 0.0, 0.0),
+    (44.0 / 45.0, -56.0 / 15.0, 32.0 / 9.0, 0.0, 0.0),
+    (19372.0 / 6561.0, -25360.0 / 2187.0, 64448.0 / 6561.0, -212.0 / 729.0, 0.0),
+    (9017.0 / 3168.0, -355.0 / 33.0, 46732.0 / 5247.0, 49.0 / 176.0, -5103.0 / 18656.0),
+)
+_DP_B = (35.0 / 384.0, 0.0, 500.0 / 1113.0, 125.0 / 192.0, -2187.0 / 6784.0, 11.0 / 84.0)
+_DP_E = (-71.0 / 57600.0, 0.0, 71.0 / 16695.0, -71.0 / 1920.0,
+         17253.0 / 339200.0, -22.0 / 525.0, 1.0 / 40.0)
+# Dense output coefficients: y(t + x h) = y + h Σ_j k_j Σ_m _DP_P[j][m] x^(m+1)
+_DP_P = (
+    (1.0, -8048581381.0 / 2820520608.0, 8663915743.0 / 2820520608.0,
+     -12715105075.0 / 11282082432.0),
+    (0.0, 0.0, 0.0, 0.0),
+    (0.0, 131558114200.0 / 32700410799.0, -68118460800.0 / 10900136933.0,
+     87487479700.0 / 32700410799.0),
+    (0.0, -1754552775.0 / 470086768.0, 14199869525.0 / 1410260304.0,
+     -10690763975.0 / 1880347072.0),
+    (0.0, 127303824393.0 / 49829197408.0, -318862633887.0 / 49829197408.0,
+     701980252875.0 / 199316789632.0),
+    (0.0, -282668133.0 / 205662961.0, 2019193451.0 / 616988883.0,
+     -1453857185.0 / 822651844.0),
+    (0.0, 40617522.0 / 29380423.0, -110615467.0 / 29380423.0,
+     69997945.0 / 29380423.0),
+)
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _eval_rhs(t, y, k, row, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Store dy/dt at (t, y) into k[row] without allocating.
+    """
+    dy = _rhs_tuple(t, y[0], y[1], y[2], y[3], y[4],
+                    M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    for i in range(5):
+        k[row, i] = dy[i]
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5_initial_step(y, k, atol, rtol, span):
+    """
+    First step size from the scale of y and dy/dt = k[0] (Hairer's heuristic).
+    """
+    d0 = 0.0
+    d1 = 0.0
+    for i in range(5):
+        scale = atol[i] + rtol * abs(y[i])
+        d0 += (y[i] / scale) ** 2
+        d1 += (k[0, i] / scale) ** 2
+    d0 = math.sqrt(d0 / 5.0)
+    d1 = math.sqrt(d1 / 5.0)
+    h = 1.0e-6 if d0 < 1.0e-5 or d1 < 1.0e-5 else 0.01 * d0 / d1
+    return min(h, span)
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5_step(y, y_new, k, atol, rtol, t, h,
+                 M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    One trial Dormand-Prince step of size h from (t, y), with k[0] = dy/dt
+    there. Fills stages k[1:7] (k[6] is the FSAL derivative at t + h) and
+    the 5th-order solution y_new; returns the RMS error norm of the
+    embedded 4th-order estimate (NaN if the state left the physical domain).
+    """
+    # Stages 2-6, then the 5th-order solution and its FSAL derivative
+    for s in range(1, 6):
+        for i in range(5):
+            acc = 0.0
+            for j in range(s):
+                acc += _DP_A[s][j] * k[j, i]
+            y_new[i] = y[i] + h * acc
+        _eval_rhs(t + _DP_C[s] * h, y_new, k, s,
+                  M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    for i in range(5):
+        acc = 0.0
+        for j in range(6):
+            acc += _DP_B[j] * k[j, i]
+        y_new[i] = y[i] + h * acc
+    _eval_rhs(t + h, y_new, k, 6, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    
+    err = 0.0
+    for i in range(5):
+        acc = 0.0
+        for j in range(7):
+            acc += _DP_E[j] * k[j, i]
+        scale = atol[i] + rtol * max(abs(y[i]), abs(y_new[i]))
+        err += (h * acc / scale) ** 2
+    return math.sqrt(err / 5.0)
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5_attempt(y, y_new, k, atol, rtol, t, h, t_end,
+                    M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Step control shared by the Dormand-Prince drivers: clip h to land on
+    t_end, try the step, and decide accept/reject and the next h.
+    
+    Returns (status, h_taken, t_new, h_next), status being 1 (accepted:
+    the caller reads y_new and k, then calls _dopri5_commit), 0 (rejected,
+    retry with h_next) or -1 (h underflowed, the integration failed).
+    """
+    last = h >= t_end - t
+    if last:
+        h = t_end - t
+    if h < STEP_MIN_REL * max(abs(t), 1.0e-300):
+        return -1, h, t, h
+    
+    err = _dopri5_step(y, y_new, k, atol, rtol, t, h,
+                       M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    if not (err <= 1.0):
+        # Reject; a NaN err (the state left the physical domain) lands here too
+        return 0, h, t, h * (0.2 if err != err else max(0.2, 0.9 * err ** -0.2))
+    
+    t_new = t_end if last else t + h  # land exactly on t_end
+    return 1, h, t_new, h * (10.0 if err == 0.0 else min(10.0, 0.9 * err ** -0.2))
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5_commit(y, y_new, k):
+    """
+    Advance to an accepted step: y <- y_new, FSAL derivative k[6] -> k[0].
+    """
+    for i in range(5):
+        y[i] = y_new[i]
+        k[0, i] = k[6, i]
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5(y, y_new, k, atol, rtol, t0, t_end, max_steps,
+            M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Integrate the Boltzmann system from t0 to t_end with adaptive
+    Dormand-Prince 5(4), advancing y in place.
+    
+    The caller owns the work arrays (y_new: 5, k: 7×5), so the loop itself
+    never allocates. Returns True if t_end was reached.
+    """
+    _eval_rhs(t0, y, k, 0, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    h = _dopri5_initial_step(y, k, atol, rtol, t_end - t0)
+    
+    t = t0
+    for _ in range(max_steps):
+        if t >= t_end:
+            return True
+        status, _h_taken, t_new, h = _dopri5_attempt(
+            y, y_new, k, atol, rtol, t, h, t_end,
+            M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff
+        )
+        if status < 0:
+            return False
+        if status > 0:
+            t = t_new
+            _dopri5_commit(y, y_new, k)
+    
+    return t >= t_end
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _dopri5_t_eval(y0, t_eval, atol, rtol, max_steps,
+                   M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff):
+    """
+    Compiled stand-in for solve_ivp(..., t_eval=t_eval): one adaptive
+    Dormand-Prince integration from t_eval[0] to t_eval[-1], as RK45 does.
+    
+    Steps are not cut at the output times; each output falling inside an
+    accepted step is filled from the step's 4th-order dense output
+    (scipy's RK45 interpolant), so h and the FSAL derivative carry over.
+    
+    Returns (ys, n) where ys[:, :n] holds the state at t_eval[:n]; n is
+    short of t_eval.size if the integration failed.
+    """
+    ys = np.empty((5, t_eval.size))
+    y = y0.copy()
+    y_new = np.empty(5)
+    k = np.empty((7, 5))
+    ys[:, 0] = y
+    
+    t = t_eval[0]
+    t_end = t_eval[-1]
+    n = 1
+    _eval_rhs(t, y, k, 0, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff)
+    h = _dopri5_initial_step(y, k, atol, rtol, t_end - t)
+    
+    for _ in range(max_steps):
+        if n == t_eval.size:
+            break
+        status, h_taken, t_new, h = _dopri5_attempt(
+            y, y_new, k, atol, rtol, t, h, t_end,
+            M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta_coeff
+        )
+        if status < 0:
+            break
+        if status == 0:
+            continue
+        
+        while n < t_eval.size and t_eval[n] < t_new:
+            x = (t_eval[n] - t) / h_taken  # in [0, 1)
+            for i in range(5):
+                acc = 0.0
+                for j in range(7):
+                    acc += k[j, i] * x * (_DP_P[j][0] + x * (_DP_P[j][1]
+                                          + x * (_DP_P[j][2] + x * _DP_P[j][3])))
+                ys[i, n] = y[i] + h_taken * acc
+            n += 1
+        if n < t_eval.size and t_eval[n] == t_new:
+            ys[:, n] = y_new
+            n += 1
+        
+        t = t_new
+        _dopri5_commit(y, y_new, k)
+    
+    return ys, n
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def _final_fractions(y, M0, m_wimp, m_ax):
+    """
+    (f_wimp, f_axion, f_pbh_rem) at state y, as in _post_process.
+    """
+    a = math.exp(max(min(y[4], LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+    a3 = a * a * a
+    rho_wimp = y[1] / a3 * m_wimp
+    rho_axion = y[2] / a3 * m_ax
+    rho_pbh_rem = y[0] if y[0] < M0 * 0.5 else 0.0
+    rho_dm_total = rho_wimp + rho_axion + rho_pbh_rem
+    if rho_dm_total > 1.0e-30:
+        return (rho_wimp / rho_dm_total, rho_axion / rho_dm_total,
+                rho_pbh_rem / rho_dm_total)
+    return 0.0, 0.0, 0.0
+
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS, error_model='numpy')
+def run_one(beta, M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, rtol, max_steps):
+    """
+    Integrate a single (β, M0) point and return its final
+    (f_wimp, f_axion, f_pbh_rem), or NaNs if the integration failed.
+    """
+    y = np.empty(5)
+    atol = np.empty(5)
+    _initial_state(M0, y, atol)
+    y_new = np.empty(5)
+    k = np.empty((7, 5))
+    
+    if not _dopri5(y, y_new, k, atol, rtol, 0.0, 1.0, max_steps,
+                   M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta * 1e10):
+        return np.nan, np.nan, np.nan
+    return _final_fractions(y, M0, m_wimp, m_ax)
+
+
+@njit(cache=True, parallel=True, error_model='numpy')
+def _scan(betas, M0s, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, rtol, max_steps):
+    """
+    run_one over independent (β, M0) pairs, one trajectory per thread.
+    """
+    out = np.empty((betas.size, 3))
+    for n in prange(betas.size):
+        f = run_one(betas[n], M0s[n], m_wimp, dof_w, eff_w, xsec_w,
+                    m_ax, dof_ax, eff_ax, rtol, max_steps)
+        out[n, 0] = f[0]
+        out[n, 1] = f[1]
+        out[n, 2] = f[2]
+    return out
+
+
+if HAVE_CUDA:
+    @cuda.jit
+    def _scan_kernel(betas, M0s, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax,
+                     rtol, max_steps, out):
+        """
+        One thread per (β, M0) trajectory; the 5-float state and the
+        Dormand-Prince stages live in thread-local memory.
+        """
+        n = cuda.grid(1)
+        if n >= betas.size:
+            return
+        
+        beta = betas[n]
+        M0 = M0s[n]
+        y = cuda.local.array(5, float64)
+        y_new = cuda.local.array(5, float64)
+        k = cuda.local.array((7, 5), float64)
+        atol = cuda.local.array(5, float64)
+        _initial_state(M0, y, atol)
+        
+        if _dopri5(y, y_new, k, atol, rtol, 0.0, 1.0, max_steps,
+                   M0, m_wimp, dof_w, eff_w, xsec_w, m_ax, dof_ax, eff_ax, beta * 1e10):
+            f = _final_fractions(y, M0, m_wimp, m_ax)
+            out[n, 0] = f[0]
+            out[n, 1] = f[1]
+            out[n, 2] = f[2]
+        else:
+            out[n, 0] = math.nan
+            out[n, 1] = math.nan
+            out[n, 2] = math.nan
+
+
+def _scan_inputs(betas, M0s, config):
+    """
+    Broadcast the scan grid and unpack the particle physics from config.
+    """
+    betas, M0s = np.broadcast_arrays(np.asarray(betas, dtype=float),
+                                     np.asarray(M0s, dtype=float))
+    wimp = config['dm']['wimp']
+    axion = config['dm']['axion']
+    species = (
+        float(wimp['mass_gev']), float(wimp['dof']),
+        float(wimp['relative_greybody_efficiency']),
+        float(wimp['annihilation_xsec_cm3_s']),
+        float(axion['mass_gev']), float(axion['dof']),
+        float(axion['relative_greybody_efficiency']),
+    )
+    return betas.shape, betas.ravel(), M0s.ravel(), species
+
+
+def scan_parameters(betas, M0s, config=CONFIG, rtol=RTOL, max_steps=100000):
+    """
+    Final DM composition for many (β, M_initial) pairs in parallel.
+    
+    betas and M0s are broadcast against each other; the particle physics
+    is taken from config. Returns an array of shape broadcast + (3,)
+    holding (f_wimp, f_axion, f_pbh_rem); points whose integration failed
+    are NaN.
+    """
+    shape, betas, M0s, species = _scan_inputs(betas, M0s, config)
+    out = _scan(betas, M0s, *species, float(rtol), int(max_steps))
+    return out.reshape(shape + (3,))
+
+
+def scan_parameters_cuda(betas, M0s, config=CONFIG, rtol=RTOL, max_steps=100000,
+                         threads_per_block=128):
+    """
+    Same as scan_parameters, but integrates one trajectory per CUDA thread.
+    """
+    if not HAVE_CUDA:
+        raise RuntimeError("scan_parameters_cuda needs numba.cuda and a CUDA GPU")
+    
+    shape, betas, M0s, species = _scan_inputs(betas, M0s, config)
+    out = cuda.device_array((betas.size, 3))
+    blocks = (betas.size + threads_per_block - 1) // threads_per_block
+    _scan_kernel[blocks, threads_per_block](
+        cuda.to_device(betas), cuda.to_device(M0s), *species,
+        float(rtol), int(max_steps), out
+    )
+    return out.copy_to_host().reshape(shape + (3,))
+
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
@@ -0,0 +1,92 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Cython build of the PBH-Unified DM right-hand side.
+
+Drop-in alternative to the Numba kernel in quick-start.py for setups
+that want no JIT at import time. Build it next to quick-start.py:
+
+    CFLAGS="-O3 -march=native -ffast-math" cythonize -i rhs_kernel.pyx
+
+and select it with CONFIG['solver']['rhs_backend'] = 'cython'.
+The equations must stay in sync with _rhs_tuple in quick-start.py.
+"""
+
+import numpy as np
+
+from libc.math cimport exp, sqrt, cbrt, fabs, fmax, fmin, log, M_PI
+from libc.float cimport DBL_MAX, DBL_MIN
+
+cdef double Gamma_0_grams3_per_sec = 5.3e-27  # Hawking evaporation coefficient
+cdef double LOG_FLOAT_MAX = log(DBL_MAX)
+cdef double LOG_FLOAT_MIN = log(DBL_MIN)
+cdef double EIGHT_PI_OVER_3 = 8.0 * M_PI / 3.0
+cdef double EXP_UNDERFLOW = 746.0  # exp(-x) is exactly 0.0 beyond this
+
+
+cpdef double[:] rhs(double t_param, double[:] y, double M0,
+                    double m_wimp, double dof_w, double eff_w, double xsec_w,
+                    double m_ax, double dof_ax, double eff_ax, double beta_coeff):
+    """
+    Right-hand side of ODE system: dy/dt
+
+    y = [M_pbh, n_wimp_a3, n_axion_a3, log(rho_rad_a4), log(a)]
+    beta_coeff is β·1e10, as passed by PBHUnifiedDMSolver._kernel_params.
+    """
+    cdef double M_pbh = y[0]
+    cdef double n_wimp_a3 = y[1]
+    cdef double n_axion_a3 = y[2]
+
+    cdef double a = exp(fmax(fmin(y[4], LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+    cdef double a3 = a * a * a
+    cdef double inv_a3 = 1.0 / a3
+    cdef double rho_rad_a4 = exp(fmax(fmin(y[3], LOG_FLOAT_MAX), LOG_FLOAT_MIN))
+
+    # Derived quantities
+    cdef double T_hawking = 1.23 / M_pbh
+    cdef double n_wimp = n_wimp_a3 * inv_a3
+    cdef double rho_rad = rho_rad_a4 / (a3 * a)
+    cdef double rho_wimp = n_wimp * m_wimp
+    cdef double rho_axion = n_axion_a3 * inv_a3 * m_ax
+
+    # Hubble parameter (simplified Friedmann)
+    cdef double H = sqrt(EIGHT_PI_OVER_3 * (rho_rad + rho_wimp + rho_axion + M_pbh))
+
+    # EQUATION 1: PBH mass evolution (memory burden S²)
+    cdef double ratio = M_pbh / M0
+    cdef double S2 = 1.0 if M_pbh > M0 * 0.5 else cbrt(ratio * ratio)
+    cdef double dM_dt = -Gamma_0_grams3_per_sec / (M_pbh * M_pbh) * S2
+
+    # Greybody production, shared prefactor for both species; exp(-m/T_H)
+    # only between m <= T_H (factor 1) and the exp underflow (factor 0)
+    cdef double inv_T = 1.0 / T_hawking
+    cdef double prefactor = fabs(dM_dt) * (inv_T * inv_T * inv_T) * beta_coeff
+    cdef double prod_wimp = prefactor * eff_w * dof_w
+    cdef double x_wimp = m_wimp * inv_T
+    if x_wimp > EXP_UNDERFLOW:
+        prod_wimp = 0.0
+    elif x_wimp > 1.0:
+        prod_wimp *= exp(-x_wimp)
+    cdef double prod_axion = prefactor * eff_ax * dof_ax
+    cdef double x_axion = m_ax * inv_T
+    if x_axion > EXP_UNDERFLOW:
+        prod_axion = 0.0
+    elif x_axion > 1.0:
+        prod_axion *= exp(-x_axion)
+
+    out = np.empty(5)
+    cdef double[:] dy = out
+
+    # EQUATION 2: WIMP production and annihilation
+    dy[1] = (prod_wimp - xsec_w * n_wimp * n_wimp * inv_a3) * a3 + n_wimp_a3 * (H * a)
+
+    # EQUATION 3: Axion production
+    dy[2] = prod_axion * a3 + n_axion_a3 * (H * a)
+
+    # EQUATION 4: Radiation energy (energy conservation)
+    dy[3] = -dM_dt / rho_rad_a4 - 4 * H if rho_rad_a4 > 0 else 0.0
+
+    # EQUATION 5: Scale factor
+    dy[4] = H if a > 0 else 0.0
+
+    dy[0] = dM_dt
+    return dy